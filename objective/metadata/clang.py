@@ -1,9 +1,11 @@
 # This is a heavily modified version of the clang Python bindings
-import collections.abc
 import ctypes
+import ctypes.util
 import enum
-import itertools
+import functools
 import os
+import re
+import sys
 import typing
 
 import objc
@@ -290,18 +292,29 @@ class SourceRange(ctypes.Structure):
 
         start_file_name = self.start.file.name
         end_file_name = self.end.file.name
-        if start_file_name == end_file_name and os.path.exists(start_file_name):
-            try:
-                with open(start_file_name) as fp:
-                    fp.seek(self.start.offset)
-                    contents = fp.read(self.end.offset - self.start.offset)
-            except UnicodeDecodeError:
-                # Sigh... some headers contain text that isn't UTF-8
-                with open(start_file_name, encoding="latin1") as fp:
-                    fp.seek(self.start.offset)
-                    contents = fp.read(self.end.offset - self.start.offset)
+        if start_file_name != end_file_name or not os.path.exists(start_file_name):
+            return None
+
+        contents = _read_source_file(start_file_name)[
+            self.start.offset : self.end.offset
+        ]
+        try:
+            return contents.decode()
+        except UnicodeDecodeError:
+            # Sigh... some headers contain text that isn't UTF-8
+            return contents.decode("latin1")
+
+
+@functools.lru_cache(maxsize=64)
+def _read_source_file(path: str) -> bytes:
+    """
+    Return the contents of a source file
 
-        return contents
+    Extents in the same header are often read one after the other, the
+    cache avoids reading the file over and over again.
+    """
+    with open(path, "rb") as fp:
+        return fp.read()
 
 
 class DiagnosticSeverity(enum.IntEnum):
@@ -513,52 +526,30 @@ class TokenGroup(object):
 
         token_group = TokenGroup(tu, tokens_memory, tokens_count)
 
-        for i in range(0, count):
-            token = Token()
-            token.int_data = tokens_array[i].int_data
-            token.ptr_data = tokens_array[i].ptr_data
+        # Copy each token out of the libclang buffer in one go instead of
+        # assigning the two array fields separately.
+        token_size = ctypes.sizeof(Token)
+        for offset in range(0, count * token_size, token_size):
+            token = Token.from_buffer_copy(tokens_array, offset)
             token._tu = tu
             token._group = token_group
 
             yield token
 
 
-class TokenKind(object):
+class TokenKind(enum.IntEnum):
     """Describes a specific type of a Token."""
 
-    _value_map: typing.Dict[int, "TokenKind"] = {}  # int -> TokenKind
-
-    def __init__(self, value, name):
-        """Create a new TokenKind instance from a numeric value and a name."""
-        self.value = value
-        self.name = name
-
-    def __repr__(self):
-        return "TokenKind.%s" % (self.name,)
-
-    @staticmethod
-    def from_value(value):
-        """Obtain a registered TokenKind instance from its value."""
-        result = TokenKind._value_map.get(value, None)
-
-        if result is None:
-            raise ValueError("Unknown TokenKind: %d" % value)
-
-        return result
-
-    @staticmethod
-    def register(value, name):
-        """Register a new TokenKind enumeration.
-
-        This should only be called at module load time by code within this
-        package.
-        """
-        if value in TokenKind._value_map:
-            raise ValueError("TokenKind already registered: %d" % value)
+    @classmethod
+    def from_value(cls, value):
+        """Obtain a TokenKind instance from its value."""
+        return cls(value)
 
-        kind = TokenKind(value, name)
-        TokenKind._value_map[value] = kind
-        setattr(TokenKind, name, kind)
+    PUNCTUATION = 0
+    KEYWORD = 1
+    IDENTIFIER = 2
+    LITERAL = 3
+    COMMENT = 4
 
 
 class CursorKind(enum.IntEnum):
@@ -571,48 +562,65 @@ class CursorKind(enum.IntEnum):
 
     @classmethod
     def from_id(cls, value):
-        return cls(value)
+        kind = _cursor_kind_by_id.get(value)
+        if kind is None:
+            return cls(value)
+        return kind
 
     @classmethod
     def get_all_kinds(cls):
         """Return all CursorKind enumeration instances."""
         return list(cls)
 
+    def _has_category(self, bit):
+        # The clang_is* predicates only depend on the kind, calculate
+        # all of them once per kind and store them in a bitmask.
+        try:
+            mask = _cursor_kind_category_masks[self.value]
+        except KeyError:
+            mask = 0
+            for idx, name in enumerate(_cursor_kind_category_functions):
+                if getattr(conf.lib, name)(self):
+                    mask |= 1 << idx
+            _cursor_kind_category_masks[self.value] = mask
+
+        return bool(mask & bit)
+
     def is_declaration(self):
         """Test if this is a declaration kind."""
-        return conf.lib.clang_isDeclaration(self)
+        return self._has_category(0x001)
 
     def is_reference(self):
         """Test if this is a reference kind."""
-        return conf.lib.clang_isReference(self)
+        return self._has_category(0x002)
 
     def is_expression(self):
         """Test if this is an expression kind."""
-        return conf.lib.clang_isExpression(self)
+        return self._has_category(0x004)
 
     def is_statement(self):
         """Test if this is a statement kind."""
-        return conf.lib.clang_isStatement(self)
+        return self._has_category(0x008)
 
     def is_attribute(self):
         """Test if this is an attribute kind."""
-        return conf.lib.clang_isAttribute(self)
+        return self._has_category(0x010)
 
     def is_invalid(self):
         """Test if this is an invalid kind."""
-        return conf.lib.clang_isInvalid(self)
+        return self._has_category(0x020)
 
     def is_translation_unit(self):
         """Test if this is a translation unit kind."""
-        return conf.lib.clang_isTranslationUnit(self)
+        return self._has_category(0x040)
 
     def is_preprocessing(self):
         """Test if this is a preprocessing kind."""
-        return conf.lib.clang_isPreprocessing(self)
+        return self._has_category(0x080)
 
     def is_unexposed(self):
         """Test if this is an unexposed kind."""
-        return conf.lib.clang_isUnexposed(self)
+        return self._has_category(0x100)
 
     # definitions, etc. However, the specific kind of the declaration is not
     # reported.
@@ -1278,6 +1286,29 @@ class CursorKind(enum.IntEnum):
     OVERLOAD_CANDIDATE = 700
 
 
+# Plain dict lookups are significantly faster than calling the enum
+# class for the kinds that are looked up for every cursor and type.
+_cursor_kind_by_id = {kind.value: kind for kind in CursorKind}
+
+# The functions used by CursorKind._has_category, the n-th function
+# determines bit n of the mask
+_cursor_kind_category_functions = (
+    "clang_isDeclaration",
+    "clang_isReference",
+    "clang_isExpression",
+    "clang_isStatement",
+    "clang_isAttribute",
+    "clang_isInvalid",
+    "clang_isTranslationUnit",
+    "clang_isPreprocessing",
+    "clang_isUnexposed",
+)
+
+# Mapping from kind id to a bitmask of the clang_is* functions that
+# return true for that kind.
+_cursor_kind_category_masks: typing.Dict[int, int] = {}
+
+
 # Template Argument Kinds
 class TemplateArgumentKind(enum.IntEnum):
     """
@@ -1334,19 +1365,18 @@ class ObjCDeclQualifier(enum.IntFlag):
 
     @staticmethod
     def from_encode_string(string):
-        val = ObjCDeclQualifier(0)
-        string = string or ""
-        for value, encode_string in _val_to_encode_string.items():
-            if encode_string in string:
-                val = val | value
-        return val
+        if isinstance(string, str):
+            string = string.encode("ascii")
+        elif not isinstance(string, (bytes, type(None))):
+            raise TypeError("Expecting bytes or str, got %s" % (type(string).__name__,))
+
+        val = 0
+        for ch in string or b"":
+            val |= _encode_char_to_val.get(ch, 0)
+        return ObjCDeclQualifier(val)
 
     def to_encode_string(self):
-        string = ""
-        for value, encode_string in _val_to_encode_string.items():
-            if self & value:
-                string = string + encode_string
-        return string
+        return _encode_string_by_val[self & 0x3F]
 
 
 _val_to_encode_string = {
@@ -1358,6 +1388,22 @@ _val_to_encode_string = {
     ObjCDeclQualifier.ONEWAY: objc._C_ONEWAY,
 }
 
+# The encoding for all 64 combinations of qualifiers, indexed by value
+_encode_string_by_val = tuple(
+    b"".join(
+        encode_string
+        for value, encode_string in _val_to_encode_string.items()
+        if combination & value
+    )
+    for combination in range(64)
+)
+
+# Single character encodings (as int, the result of iterating over bytes)
+# to the corresponding qualifier value
+_encode_char_to_val = {
+    encode_string[0]: value for value, encode_string in _val_to_encode_string.items()
+}
+
 
 class Version(ctypes.Structure):
     _fields_ = [
@@ -1507,7 +1553,7 @@ class Cursor(ctypes.Structure):
         program. USRs can be compared across translation units to determine,
         e.g., when references in one translation refer to an entity defined in
         another translation unit."""
-        return conf.lib.clang_getCursorUSR(self)
+        return sys.intern(conf.lib.clang_getCursorUSR(self))
 
     def get_included_file(self):
         """Returns the File that is included by the current inclusion cursor."""
@@ -1518,13 +1564,21 @@ class Cursor(ctypes.Structure):
     @property
     def kind(self):
         """Return the kind of this cursor."""
-        return CursorKind.from_id(self._kind_id)
+        if not hasattr(self, "_kind"):
+            self._kind = CursorKind.from_id(self._kind_id)
+
+        return self._kind
 
     @property
     def spelling(self):
         """Return the spelling of the entity pointed at by the cursor."""
         if not hasattr(self, "_spelling"):
-            self._spelling = conf.lib.clang_getCursorSpelling(self)
+            # Headers repeat the same identifiers over and over again,
+            # interning avoids keeping lots of equal copies alive and
+            # speeds up dict lookups keyed on these names. Other strings
+            # (comments, diagnostics, ...) are not interned because interned
+            # strings can stay alive until the process exits.
+            self._spelling = sys.intern(conf.lib.clang_getCursorSpelling(self))
 
         return self._spelling
 
@@ -1538,7 +1592,7 @@ class Cursor(ctypes.Structure):
         arguments of a class template specialization.
         """
         if not hasattr(self, "_displayname"):
-            self._displayname = conf.lib.clang_getCursorDisplayName(self)
+            self._displayname = sys.intern(conf.lib.clang_getCursorDisplayName(self))
 
         return self._displayname
 
@@ -1565,9 +1619,9 @@ class Cursor(ctypes.Structure):
     def linkage(self):
         """Return the linkage of this cursor."""
         if not hasattr(self, "_linkage"):
-            self._linkage = conf.lib.clang_getCursorLinkage(self)
+            self._linkage = LinkageKind.from_id(conf.lib.clang_getCursorLinkage(self))
 
-        return LinkageKind.from_id(self._linkage)
+        return self._linkage
 
     @property
     def tls_kind(self):
@@ -1677,9 +1731,11 @@ class Cursor(ctypes.Structure):
     def objc_type_encoding(self) -> bytes:
         """Return the Objective-C type encoding as a str."""
         if not hasattr(self, "_objc_type_encoding"):
-            self._objc_type_encoding = conf.lib.clang_getDeclObjCTypeEncoding(self)
+            self._objc_type_encoding = conf.lib.clang_getDeclObjCTypeEncoding(
+                self
+            ).encode()
 
-        return self._objc_type_encoding.encode()
+        return self._objc_type_encoding
 
     @property
     def hash(self):
@@ -1770,16 +1826,12 @@ class Cursor(ctypes.Structure):
     def get_children(self):
         """Return an iterator for accessing the children of this cursor."""
 
-        def visitor(child, parent, children):
-            assert child != conf.lib.clang_getNullCursor()
+        children = []
+        conf.lib.clang_visitChildren(self, _collect_cursor_callback, children)
 
-            # Create reference to TU so it isn't GC'd before Cursor.
+        # Create reference to TU so it isn't GC'd before Cursor.
+        for child in children:
             child._tu = self._tu
-            children.append(child)
-            return 1  # continue
-
-        children = []
-        conf.lib.clang_visitChildren(self, callbacks["cursor_visit"](visitor), children)
         return iter(children)
 
     def walk_preorder(self):
@@ -1869,46 +1921,53 @@ class Cursor(ctypes.Structure):
 
         interface_decl = walker
 
-        current_level = "protected"  # default
-        last_token_was_at = False
-        for token in interface_decl.get_tokens():
-            tstr = token.spelling
-            if not last_token_was_at and tstr == "@":
-                last_token_was_at = True
-            elif last_token_was_at:
-                last_token_was_at = False
-                if tstr in {"public", "protected", "package", "private"}:
-                    current_level = tstr
-            elif self.spelling == tstr:
-                return current_level
-
-        return None
+        # Scan the tokens of an interface only once, and cache the access
+        # level for every identifier on the translation unit.
+        key = (
+            interface_decl._kind_id,
+            interface_decl.xdata,
+            tuple(interface_decl.data),
+        )
+        access_levels = self._tu._access_levels.get(key)
+        if access_levels is None:
+            access_levels = self._tu._access_levels[key] = {}
+
+            current_level = "protected"  # default
+            last_token_was_at = False
+            for token in interface_decl.get_tokens():
+                tstr = token.spelling
+                if not last_token_was_at and tstr == "@":
+                    last_token_was_at = True
+                elif last_token_was_at:
+                    last_token_was_at = False
+                    if tstr in {"public", "protected", "package", "private"}:
+                        current_level = tstr
+                else:
+                    access_levels.setdefault(tstr, current_level)
+
+        return access_levels.get(self.spelling)
 
     def reconstitute_macro(self):
         if self.kind != CursorKind.MACRO_DEFINITION:
             return None
 
         # try to reconstitute by tokens...
-        string = ""
+        parts = []
         min_offset = self.extent.start.offset
         max_offset = self.extent.end.offset
-        tokens = list(self.get_tokens())
 
-        last_token = None
-        for token in tokens:
-            if (
-                last_token
-                and (token.extent.start.offset - last_token.extent.end.offset) >= 1
-            ):
-                string += " "
-            if (
-                token.extent.start.offset >= min_offset
-                and token.extent.end.offset <= max_offset
-            ):
-                string += token.spelling
-            last_token = token
+        last_end = None
+        for token in self.get_tokens():
+            extent = token.extent
+            start = extent.start.offset
+            end = extent.end.offset
+            if last_end is not None and (start - last_end) >= 1:
+                parts.append(" ")
+            if start >= min_offset and end <= max_offset:
+                parts.append(token.spelling)
+            last_end = end
 
-        return string.rstrip(" ")
+        return "".join(parts).rstrip(" ")
 
     @property
     def objc_decl_qualifiers(self):
@@ -1941,17 +2000,7 @@ class Cursor(ctypes.Structure):
                 underlying_type = (
                     underlying_type.get_declaration().enum_type.get_canonical()
                 )
-            if underlying_type.kind in (
-                TypeKind.CHAR_U,
-                TypeKind.UCHAR,
-                TypeKind.CHAR16,
-                TypeKind.CHAR32,
-                TypeKind.USHORT,
-                TypeKind.UINT,
-                TypeKind.ULONG,
-                TypeKind.ULONGLONG,
-                TypeKind.UINT128,
-            ):
+            if underlying_type.kind in _unsigned_type_kinds:
                 self._enum_value = conf.lib.clang_getEnumConstantDeclUnsignedValue(
                     self
                 )  # noqa: B950
@@ -2023,7 +2072,11 @@ class Cursor(ctypes.Structure):
     def get_struct_field_decls(self):
         if self.kind != CursorKind.STRUCT_DECL:
             return None
-        return filter(lambda x: x.kind == CursorKind.FIELD_DECL, self.get_children())
+        return [
+            child
+            for child in self.get_children()
+            if child.kind == CursorKind.FIELD_DECL
+        ]
 
     def get_function_specifiers(self):
         if self.kind != CursorKind.FUNCTION_DECL:
@@ -2045,32 +2098,22 @@ class Cursor(ctypes.Structure):
         raw_string = self.extent.get_raw_contents()
         before_func = raw_string.split(func_name)[0]
 
-        if "inline" in before_func or "INLINE" in before_func:
-            func_specs.add("inline")
-        if "virtual" in before_func:
-            func_specs.add("virtual")
-        if "explicit" in before_func:
-            func_specs.add("explicit")
+        for spec in _function_specifier_re.findall(before_func):
+            func_specs.add("inline" if spec == "INLINE" else spec)
 
         return list(func_specs)
 
     @property
     def first_child(self):
         child_holder = []
+        conf.lib.clang_visitChildren(self, _first_cursor_callback, child_holder)
+        if not child_holder:
+            return None
 
-        def first_child_visitor(child, parent, holder):
-            assert child != conf.lib.clang_getNullCursor()
-            assert parent != child
-            # Create reference to TU so it isn't GC'd before Cursor.
-            child._tu = self._tu
-            holder.append(child)
-            return 0  # CXChildVisit_Break
-
-        conf.lib.clang_visitChildren(
-            self, callbacks["cursor_visit"](first_child_visitor), child_holder
-        )
-
-        return None if len(child_holder) == 0 else child_holder[0]
+        child = child_holder[0]
+        # Create reference to TU so it isn't GC'd before Cursor.
+        child._tu = self._tu
+        return child
 
     def get_property_attributes(
         self,
@@ -2081,9 +2124,13 @@ class Cursor(ctypes.Structure):
         attr_flags = conf.lib.clang_Cursor_getObjCPropertyAttributes(self, 0)
 
         attrs: typing.Set[typing.Union[str, typing.Tuple[str, str]]] = set()
-        for flag, attr in _attr_flag_dict.items():
-            if attr_flags & flag:
-                attrs.add(attr)
+
+        # Only visit the bits that are set, lowest bit first
+        bits = attr_flags & _attr_flag_mask
+        while bits:
+            flag = bits & -bits
+            attrs.add(_attr_flag_dict[flag])
+            bits ^= flag
 
         typestr = self.objc_type_encoding
         assert typestr is not None
@@ -2115,15 +2162,23 @@ class Cursor(ctypes.Structure):
 
     @property
     def is_virtual(self):
-        return conf.lib.clang_CXXMethod_isVirtual(self)
+        if not hasattr(self, "_is_virtual"):
+            self._is_virtual = conf.lib.clang_CXXMethod_isVirtual(self)
+        return self._is_virtual
 
     @property
     def is_optional_for_protocol(self):
-        return bool(conf.lib.clang_Cursor_isObjCOptional(self))
+        if not hasattr(self, "_is_optional_for_protocol"):
+            self._is_optional_for_protocol = bool(
+                conf.lib.clang_Cursor_isObjCOptional(self)
+            )
+        return self._is_optional_for_protocol
 
     @property
     def is_variadic(self):
-        return bool(conf.lib.clang_Cursor_isVariadic(self))
+        if not hasattr(self, "_is_variadic"):
+            self._is_variadic = bool(conf.lib.clang_Cursor_isVariadic(self))
+        return self._is_variadic
 
     @property
     def type_valid(self):
@@ -2175,15 +2230,21 @@ class Cursor(ctypes.Structure):
         }
         for i in range(r):
             result["platform"][_CXString.from_result(availability[i].platform)] = {
-                "introduced": availability[i].introduced
-                if availability[i].introduced.major != -1
-                else None,
-                "deprecated": availability[i].deprecated
-                if availability[i].deprecated.major != -1
-                else None,
-                "obsoleted": availability[i].obsoleted
-                if availability[i].obsoleted.major != -1
-                else None,
+                "introduced": (
+                    availability[i].introduced
+                    if availability[i].introduced.major != -1
+                    else None
+                ),
+                "deprecated": (
+                    availability[i].deprecated
+                    if availability[i].deprecated.major != -1
+                    else None
+                ),
+                "obsoleted": (
+                    availability[i].obsoleted
+                    if availability[i].obsoleted.major != -1
+                    else None
+                ),
                 "unavailable": bool(availability[i].unavailable),
                 "message": _CXString.from_result(availability[i].message),
             }
@@ -2206,6 +2267,13 @@ _attr_flag_dict = {
     0x800: "unsafe_unretained",
 }
 
+# Function specifiers in the source text before the function name,
+# this intentionally also matches macros like NS_INLINE.
+_function_specifier_re = re.compile("inline|INLINE|virtual|explicit")
+
+# All flags in _attr_flag_dict, other flags are ignored
+_attr_flag_mask = sum(_attr_flag_dict)
+
 
 class StorageClass(enum.IntEnum):
     """
@@ -2285,7 +2353,10 @@ class TypeKind(enum.IntEnum):
 
     @classmethod
     def from_id(cls, value):
-        return cls(value)
+        kind = _type_kind_by_id.get(value)
+        if kind is None:
+            return cls(value)
+        return kind
 
     @property
     def spelling(self):
@@ -2412,6 +2483,23 @@ class TypeKind(enum.IntEnum):
     OCLIntelSubgroupAVCImeDualRefStreamin = 175
 
 
+_type_kind_by_id = {kind.value: kind for kind in TypeKind}
+
+# Unsigned integer kinds, used to pick the right accessor for enum values
+_unsigned_type_kinds = frozenset(
+    (
+        TypeKind.CHAR_U,
+        TypeKind.UCHAR,
+        TypeKind.CHAR16,
+        TypeKind.CHAR32,
+        TypeKind.USHORT,
+        TypeKind.UINT,
+        TypeKind.ULONG,
+        TypeKind.ULONGLONG,
+        TypeKind.UINT128,
+    )
+)
+
 # noinspection PyProtectedMember
 _typekind_to_objc_types_map_common = {
     # The comments are the list of Clang's "built-ins"
@@ -2484,31 +2572,21 @@ _typekind_to_objc_types_map_32 = {
     TypeKind.LONG: objc._C_LNG,
 }
 
+_typekind_to_objc_types_map_lp64 = {
+    **_typekind_to_objc_types_map_common,
+    **_typekind_to_objc_types_map_64,
+}
+
+_typekind_to_objc_types_map_ilp32 = {
+    **_typekind_to_objc_types_map_common,
+    **_typekind_to_objc_types_map_32,
+}
+
 _typekind_by_arch_map = {
-    "arm64": dict(
-        itertools.chain(
-            _typekind_to_objc_types_map_common.items(),
-            _typekind_to_objc_types_map_64.items(),
-        )
-    ),
-    "x86_64": dict(
-        itertools.chain(
-            _typekind_to_objc_types_map_common.items(),
-            _typekind_to_objc_types_map_64.items(),
-        )
-    ),
-    "ppc64": dict(
-        itertools.chain(
-            _typekind_to_objc_types_map_common.items(),
-            _typekind_to_objc_types_map_64.items(),
-        )
-    ),
-    "i386": dict(
-        itertools.chain(
-            _typekind_to_objc_types_map_common.items(),
-            _typekind_to_objc_types_map_32.items(),
-        )
-    ),
+    "arm64": _typekind_to_objc_types_map_lp64,
+    "x86_64": _typekind_to_objc_types_map_lp64,
+    "ppc64": _typekind_to_objc_types_map_lp64,
+    "i386": _typekind_to_objc_types_map_ilp32,
 }
 
 
@@ -2535,6 +2613,8 @@ class LinkageKind(enum.IntEnum):
 
     @classmethod
     def from_id(cls, value):
+        if 0 <= value < len(_linkage_kind_by_id):
+            return _linkage_kind_by_id[value]
         return cls(value)
 
     INVALID = 0
@@ -2544,6 +2624,11 @@ class LinkageKind(enum.IntEnum):
     EXTERNAL = 4
 
 
+# The linkage kinds are numbered sequentially from 0
+_linkage_kind_by_id = tuple(LinkageKind)
+assert all(kind.value == idx for idx, kind in enumerate(_linkage_kind_by_id))
+
+
 class TLSKind(enum.IntEnum):
     """Describes the kind of thread-local storage (TLS) of a cursor."""
 
@@ -2586,47 +2671,20 @@ class Type(ctypes.Structure):
     @property
     def kind(self):
         """Return the kind of this type."""
-        return TypeKind.from_id(self._kind_id)
+        if not hasattr(self, "_kind"):
+            self._kind = TypeKind.from_id(self._kind_id)
+
+        return self._kind
 
     def argument_types(self):
-        """Retrieve a container for the non-variadic arguments for this type.
+        """Retrieve the non-variadic arguments for this type.
 
-        The returned object is iterable and indexable. Each item in the
-        container is a Type instance.
+        Returns a tuple of Type instances, which is empty for types
+        that aren't function types.
         """
-
-        class ArgumentsIterator(collections.abc.Sequence):
-            def __init__(self, parent):
-                self.parent = parent
-                self.length = None
-
-            def __len__(self):
-                if self.length is None:
-                    self.length = conf.lib.clang_getNumArgTypes(self.parent)
-
-                return self.length
-
-            def __getitem__(self, key):
-                # libclang had a fix-me here of: Support slice objects.
-                if not isinstance(key, int):
-                    raise TypeError("Must supply a non-negative int.")
-
-                if key < 0:
-                    raise IndexError("Only non-negative indexes are accepted.")
-
-                if key >= len(self):
-                    raise IndexError(
-                        "Index greater than container length: "
-                        "%d > %d" % (key, len(self))
-                    )
-
-                result = conf.lib.clang_getArgType(self.parent, key)
-                if result.kind == TypeKind.INVALID:
-                    raise IndexError("Argument could not be retrieved.")
-
-                return result
-
-        return ArgumentsIterator(self)
+        # clang_getNumArgTypes returns -1 for non-function types
+        num_args = conf.lib.clang_getNumArgTypes(self)
+        return tuple(conf.lib.clang_getArgType(self, i) for i in range(num_args))
 
     @property
     def element_type(self):
@@ -2782,19 +2840,12 @@ class Type(ctypes.Structure):
 
     def get_fields(self):
         """Return an iterator for accessing the fields of this type."""
+        fields = []
+        conf.lib.clang_Type_visitFields(self, _collect_field_callback, fields)
 
-        def visitor(field, children):
-            assert field != conf.lib.clang_getNullCursor()
-
-            # Create reference to TU so it isn't GC'd before Cursor.
+        # Create reference to TU so it isn't GC'd before Cursor.
+        for field in fields:
             field._tu = self._tu
-            fields.append(field)
-            return 1  # continue
-
-        fields = []
-        conf.lib.clang_Type_visitFields(
-            self, callbacks["fields_visit"](visitor), fields
-        )
         return iter(fields)
 
     def get_exception_specification_kind(self):
@@ -2847,6 +2898,11 @@ class Type(ctypes.Structure):
 
     @property
     def looks_like_function(self):
+        if not hasattr(self, "_looks_like_function"):
+            self._looks_like_function = self._calculate_looks_like_function()
+        return self._looks_like_function
+
+    def _calculate_looks_like_function(self):
         if self.kind == TypeKind.FUNCTIONPROTO or self.kind == TypeKind.FUNCTIONNOPROTO:
             return True
 
@@ -2882,15 +2938,17 @@ class Type(ctypes.Structure):
         return self
 
     def ever_passes_test(self, pred):
-        if pred(self):
-            return True
-        elif self.kind == TypeKind.TYPEDEF:
-            td = self.declaration
-            ult = None if td is None else td.underlying_typedef_type_valid
-            if ult:
-                return ult.ever_passes_test(pred)
+        # Walk the chain of typedefs without recursing
+        current = self
+        while not pred(current):
+            if current.kind != TypeKind.TYPEDEF:
+                return False
+            td = current.declaration
+            current = None if td is None else td.underlying_typedef_type_valid
+            if not current:
+                return False
 
-        return False
+        return True
 
     def ever_defines_to(self, type_name):
         return self.ever_passes_test(
@@ -2929,9 +2987,11 @@ class Type(ctypes.Structure):
     @property
     def nullability(self):
         if not hasattr(self, "_nullability"):
-            self._nullability = conf.lib.clang_Type_getNullability(self)
+            self._nullability = NullabilityKind.from_id(
+                conf.lib.clang_Type_getNullability(self)
+            )
 
-        return NullabilityKind.from_id(self._nullability)
+        return self._nullability
 
     @property
     def modified_type(self):
@@ -3123,17 +3183,14 @@ class CompletionString(ClangObject):
     def briefComment(self):
         if conf.function_exists("clang_getCompletionBriefComment"):
             return conf.lib.clang_getCompletionBriefComment(self.obj)
-        return _CXString()
+        return ""
 
     def __repr__(self):
+        chunks = " | ".join(str(a) for a in self)
         return (
-            " | ".join([str(a) for a in self])
-            + " || Priority: "
-            + str(self.priority)
-            + " || Availability: "
-            + str(self.availability)
-            + " || Brief comment: "
-            + str(self.briefComment)
+            f"{chunks} || Priority: {self.priority}"
+            f" || Availability: {self.availability}"
+            f" || Brief comment: {self.briefComment}"
         )
 
 
@@ -3401,6 +3458,8 @@ class TranslationUnit(ClangObject):
         """
         assert isinstance(index, Index)
         self.index = index
+        # Cache for Cursor.access_specifier
+        self._access_levels = {}
         ClangObject.__init__(self, ptr)
 
     def __del__(self):
@@ -3425,16 +3484,9 @@ class TranslationUnit(ClangObject):
         headers.
         """
 
-        def visitor(fobj, lptr, depth, includes):
-            if depth > 0:
-                loc = lptr.contents
-                includes.append(FileInclusion(loc.file, File(fobj), loc, depth))
-
         # Automatically adapt CIndex/ctype pointers to python objects
         includes = []
-        conf.lib.clang_getInclusions(
-            self, callbacks["translation_unit_includes"](visitor), includes
-        )
+        conf.lib.clang_getInclusions(self, _collect_inclusion_callback, includes)
 
         return iter(includes)
 
@@ -3452,11 +3504,19 @@ class TranslationUnit(ClangObject):
           - 2-tuple of (line number, column number). Initial file position is
             (0, 0)
         """
-        f = self.get_file(filename)
+        return self._to_location(self.get_file(filename), position)
+
+    def _to_location(self, f, position):
+        """Convert an offset or (line, column) pair in *f* to a SourceLocation.
 
-        if isinstance(position, int):
+        SourceLocation instances are returned unchanged.
+        """
+        if type(position) is int:
             return SourceLocation.from_offset(self, f, position)
 
+        if isinstance(position, SourceLocation):
+            return position
+
         return SourceLocation.from_position(self, f, position[0], position[1])
 
     def get_extent(self, filename, locations):
@@ -3481,19 +3541,8 @@ class TranslationUnit(ClangObject):
 
         start_location, end_location = locations
 
-        if hasattr(start_location, "__len__"):
-            start_location = SourceLocation.from_position(
-                self, f, start_location[0], start_location[1]
-            )
-        elif isinstance(start_location, int):
-            start_location = SourceLocation.from_offset(self, f, start_location)
-
-        if hasattr(end_location, "__len__"):
-            end_location = SourceLocation.from_position(
-                self, f, end_location[0], end_location[1]
-            )
-        elif isinstance(end_location, int):
-            end_location = SourceLocation.from_offset(self, f, end_location)
+        start_location = self._to_location(f, start_location)
+        end_location = self._to_location(f, end_location)
 
         assert isinstance(start_location, SourceLocation)
         assert isinstance(end_location, SourceLocation)
@@ -3887,6 +3936,13 @@ class Token(ctypes.Structure):
         return cursor
 
 
+# The layout of CXToken is fixed by libclang, TokenGroup.get_tokens depends on
+# there being no padding between tokens in the array returned by clang_tokenize.
+assert ctypes.sizeof(Token) == 4 * ctypes.sizeof(ctypes.c_uint) + ctypes.sizeof(
+    ctypes.c_void_p
+)
+
+
 # Now comes the plumbing to hook up the C library.
 
 # Register callback types in common container.
@@ -3898,6 +3954,41 @@ callbacks["cursor_visit"] = ctypes.CFUNCTYPE(
 )
 callbacks["fields_visit"] = ctypes.CFUNCTYPE(ctypes.c_int, Cursor, ctypes.py_object)
 
+
+# The visitor callbacks below don't depend on the cursor, type or translation
+# unit that is visited and are therefore wrapped once instead of creating a
+# new closure and callback object for every visit. The Python object passed
+# to the visitor is the list the results are collected in.
+#
+# Note that libclang never passes a null cursor to the visitor.
+
+
+def _collect_cursor(child, parent, children):
+    children.append(child)
+    return 1  # CXChildVisit_Continue
+
+
+def _first_cursor(child, parent, children):
+    children.append(child)
+    return 0  # CXChildVisit_Break
+
+
+def _collect_field(field, fields):
+    fields.append(field)
+    return 1  # CXVisit_Continue
+
+
+def _collect_inclusion(fobj, lptr, depth, includes):
+    if depth > 0:
+        loc = lptr.contents
+        includes.append(FileInclusion(loc.file, File(fobj), loc, depth))
+
+
+_collect_cursor_callback = callbacks["cursor_visit"](_collect_cursor)
+_first_cursor_callback = callbacks["cursor_visit"](_first_cursor)
+_collect_field_callback = callbacks["fields_visit"](_collect_field)
+_collect_inclusion_callback = callbacks["translation_unit_includes"](_collect_inclusion)
+
 # Functions strictly alphabetical order.
 functionList = [
     (
@@ -4106,7 +4197,7 @@ functionList = [
         SourceLocation,
     ),
     ("clang_getNullCursor", None, Cursor),
-    ("clang_getNumArgTypes", [Type], ctypes.c_uint),
+    ("clang_getNumArgTypes", [Type], ctypes.c_int),
     ("clang_getNumCompletionChunks", [ctypes.c_void_p], ctypes.c_int),
     ("clang_getNumDiagnostics", [c_object_p], ctypes.c_uint),
     ("clang_getNumDiagnosticsInSet", [c_object_p], ctypes.c_uint),
@@ -4291,42 +4382,61 @@ class LibclangError(Exception):
         return self.m
 
 
-def register_function(lib, item, ignore_errors):
-    # A function may not exist, if these bindings are used with an older or
-    # incompatible version of libclang.so.
-    try:
-        func = getattr(lib, item[0])
-    except AttributeError as e:
-        msg = (
-            str(e) + ". Please ensure that your python bindings are "
-            "compatible with your libclang.so version."
-        )
-        if ignore_errors:
-            return
-        raise LibclangError(msg)
+# Attributes of a ctypes function pointer that are set from the entries
+# of functionList, in order.
+_PROTOTYPE_ATTRIBUTES = ("argtypes", "restype", "errcheck")
+
+# Mapping from function name to the rest of its entry in functionList
+_function_prototypes = {name: prototype for name, *prototype in functionList}
+
+
+class _LibclangLibrary(ctypes.CDLL):
+    """
+    A CDLL that sets up the prototype of libclang functions on first use
 
-    if len(item) >= 2:
-        func.argtypes = item[1]
+    Most runs only call a subset of the functions in functionList, there's
+    no need to set up the others.
+    """
+
+    def __getattr__(self, name):
+        # CDLL.__getattr__ caches the function on the instance, this
+        # method won't be called again for the same name.
+        func = super().__getattr__(name)
 
-    if len(item) >= 3:
-        func.restype = item[2]
+        # Entries can leave off trailing attributes, the ctypes defaults are
+        # used for those. Note that a restype of None is significant (void
+        # function).
+        prototype = _function_prototypes.get(name, ())
+        for attr, value in zip(_PROTOTYPE_ATTRIBUTES, prototype):
+            setattr(func, attr, value)
 
-    if len(item) == 4:
-        func.errcheck = item[3]
+        return func
 
 
 def register_functions(lib, ignore_errors):
-    """Register function prototypes with a libclang library instance.
+    """Check that libclang provides all functions in functionList.
 
-    This must be called as part of library instantiation so Python knows how
-    to call out to the shared library.
+    The prototypes themselves are set up on first use of a function by
+    _LibclangLibrary.
     """
+    if ignore_errors:
+        return
+
+    for name in _function_prototypes:
+        # A function may not exist, if these bindings are used with an older or
+        # incompatible version of libclang.so.
+        try:
+            lib[name]
+        except AttributeError as e:
+            msg = (
+                str(e) + ". Please ensure that your python bindings are "
+                "compatible with your libclang.so version."
+            )
+            raise LibclangError(msg)
 
-    def register(item):
-        return register_function(lib, item, ignore_errors)
 
-    for f in functionList:
-        register(f)
+# Loaded libclang instances, by filename
+_library_cache: typing.Dict[str, ctypes.CDLL] = {}
 
 
 class Config(object):
@@ -4335,6 +4445,9 @@ class Config(object):
     compatibility_check: bool = True
     loaded: bool = False
 
+    def __init__(self) -> None:
+        self._function_exists: typing.Dict[str, bool] = {}
+
     @classmethod
     def set_library_path(cls, path: typing.Union[str, os.PathLike[str]]) -> None:
         """Set the path in which to search for libclang"""
@@ -4383,6 +4496,9 @@ class Config(object):
 
         cls.compatibility_check = check_status
 
+    # The library is loaded once and then cached on the instance. Function
+    # pointers are cached by ctypes on the CDLL after their first lookup,
+    # that is ``conf.lib.clang_foo`` is two dict lookups after the first call.
     @CachedProperty
     def lib(self):
         lib = self.get_cindex_library()
@@ -4402,17 +4518,25 @@ class Config(object):
             name = "libclang.dylib"
         elif name == "Windows":
             name = "libclang.dll"
-        else:
+        elif Config.library_path:
             name = "libclang-11.so"
+        else:
+            name = ctypes.util.find_library("clang") or "libclang-11.so"
 
         if Config.library_path:
-            name = Config.library_path + "/" + name
+            name = os.path.join(Config.library_path, name)
 
         return name
 
     def get_cindex_library(self) -> ctypes.CDLL:
+        filename = self.get_filename()
         try:
-            library = ctypes.cdll.LoadLibrary(self.get_filename())
+            return _library_cache[filename]
+        except KeyError:
+            pass
+
+        try:
+            library = _LibclangLibrary(filename)
         except OSError as e:
             msg = (
                 str(e) + ". To provide a path to libclang use "
@@ -4421,34 +4545,29 @@ class Config(object):
             )
             raise LibclangError(msg)
 
+        _library_cache[filename] = library
         return library
 
     def function_exists(self, name: str) -> bool:
+        # Lookups of missing functions aren't cached by ctypes and
+        # go through dlsym(3) every time, hence the explicit cache.
+        try:
+            return self._function_exists[name]
+        except KeyError:
+            pass
+
         try:
             getattr(self.lib, name)
         except AttributeError:
-            return False
-
-        return True
-
-
-TokenKinds = [
-    ("PUNCTUATION", 0),
-    ("KEYWORD", 1),
-    ("IDENTIFIER", 2),
-    ("LITERAL", 3),
-    ("COMMENT", 4),
-]
-
+            exists = False
+        else:
+            exists = True
 
-def register_enumerations():
-    # XXX: This should be an IntEnum
-    for name, value in TokenKinds:
-        TokenKind.register(value, name)
+        self._function_exists[name] = exists
+        return exists
 
 
 conf = Config()
-register_enumerations()
 
 __all__ = [
     "AvailabilityKind",
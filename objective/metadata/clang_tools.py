@@ -1,35 +1,68 @@
+import sys
+import typing
+
 from . import clang
 
 INDENT_STEP = "    "
 
 
-def dump_type(node: clang.Type, indent: str = "") -> None:
-    print(indent + node.kind.name, node.is_pod())
-    print(indent + node.spelling)
-    print(indent + "nullability: " + str(node.nullability))
-    print(indent + "argument_types:", list(node.argument_types()))
+def dump_type(
+    node: clang.Type, indent: str = "", file: typing.Optional[typing.TextIO] = None
+) -> None:
+    out: typing.List[str] = []
+    try:
+        _dump_type(node, indent, out)
+    finally:
+        _write_lines(out, file)
+
+
+def dump_node(
+    node: clang.Cursor, indent: str = "", file: typing.Optional[typing.TextIO] = None
+) -> None:
+    out: typing.List[str] = []
+    try:
+        _dump_node(node, indent, out)
+    finally:
+        _write_lines(out, file)
+
+
+def _write_lines(out: typing.List[str], file: typing.Optional[typing.TextIO]) -> None:
+    # Write the entire dump at once, also when dumping failed halfway
+    if not out:
+        return
+    if file is None:
+        file = sys.stdout
+    file.write("\n".join(out) + "\n")
+
+
+def _dump_type(node: clang.Type, indent: str, out: typing.List[str]) -> None:
+    is_pod = node.is_pod()
+    out.append(f"{indent}{node.kind.name} {is_pod}")
+    out.append(indent + node.spelling)
+    out.append(indent + "nullability: " + str(node.nullability))
+    out.append(f"{indent}argument_types: {list(node.argument_types())}")
     try:
-        print(indent + "availability:", node.availability)
+        out.append(f"{indent}availability: {node.availability!s}")
     except AttributeError:
         pass
-    print(indent + "get_array_element_type:", node.get_array_element_type())
-    print(indent + "get_array_size:", node.get_array_size())
-    print(indent + "data", node.data)
-    print(indent + "get_canonical:", node.get_canonical())
+    out.append(f"{indent}get_array_element_type: {node.get_array_element_type()}")
+    out.append(f"{indent}get_array_size: {node.get_array_size()}")
+    out.append(f"{indent}data {node.data}")
     canonical = node.get_canonical()
+    out.append(f"{indent}get_canonical: {canonical}")
     if canonical is not None and node.kind is clang.TypeKind.TYPEDEF:
-        dump_type(node.get_canonical(), indent + "  ")
-    print(indent + "get_declaration:", node.get_declaration())
-    print(indent + "get_pointee:", node.get_pointee())
-    print(indent + "get_result:", node.get_result())
-    print(indent + "is_const_qualified:", node.is_const_qualified())
-    print(indent + "is_pod:", node.is_pod())
-    print(indent + "is_restrict_qualified:", node.is_restrict_qualified())
-    print(indent + "kind:", node.kind)
-    print(indent + "translation_unit:", node.translation_unit)
-
-
-def dump_node(node: clang.Cursor, indent: str = "") -> None:
+        _dump_type(canonical, indent + "  ", out)
+    out.append(f"{indent}get_declaration: {node.get_declaration()}")
+    out.append(f"{indent}get_pointee: {node.get_pointee()}")
+    out.append(f"{indent}get_result: {node.get_result()}")
+    out.append(f"{indent}is_const_qualified: {node.is_const_qualified()}")
+    out.append(f"{indent}is_pod: {is_pod}")
+    out.append(f"{indent}is_restrict_qualified: {node.is_restrict_qualified()}")
+    out.append(f"{indent}kind: {node.kind!s}")
+    out.append(f"{indent}translation_unit: {node.translation_unit}")
+
+
+def _dump_node(node: clang.Cursor, indent: str, out: typing.List[str]) -> None:
     header = [type(node).__name__, node.kind.name]
     if node.spelling:
         header.append("spelling=" + node.spelling)
@@ -38,19 +71,18 @@ def dump_node(node: clang.Cursor, indent: str = "") -> None:
     if node.objc_type_encoding and node.objc_type_encoding != "?":
         header.append("encoding=%r" % (node.objc_type_encoding,))
     header.append("is_attribute=%r" % (node.kind.is_attribute()))
-    print(indent + " ".join(header))
+    out.append(indent + " ".join(header))
     try:
-        print(indent + "availability:", node.availability)
+        out.append(f"{indent}availability: {node.availability!s}")
     except AttributeError:
         pass
 
-    print(indent + "platform avail", node.platform_availability)
+    out.append(f"{indent}platform avail {node.platform_availability}")
     if node.type:
-        print(indent + "  type:")
-        dump_type(node.type, indent + INDENT_STEP)
-
-    children = list(node.get_children())
-    if children:
-        print(indent + "  children:")
-        for ch in children:
-            dump_node(ch, indent + INDENT_STEP)
+        out.append(indent + "  type:")
+        _dump_type(node.type, indent + INDENT_STEP, out)
+
+    for idx, ch in enumerate(node.get_children()):
+        if idx == 0:
+            out.append(indent + "  children:")
+        _dump_node(ch, indent + INDENT_STEP, out)
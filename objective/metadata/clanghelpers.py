@@ -5,29 +5,91 @@ interesting definitions using Clang.
 I realize that my "categories" on the libclang python classes are more Obj-C-ish
 than "pythonic" but, hey, I'm an ObjC developer first...
 """
+
 import typing
 
 from . import clang
 
+_known_cursor_kinds = frozenset(kind.value for kind in clang.CursorKind)
+
+
+def _check_cursor_kind(cursor: clang.Cursor) -> None:
+    """
+    Raise ValueError when the kind of *cursor* isn't known to the bindings,
+    instead of silently descending into it.
+    """
+    if cursor._kind_id not in _known_cursor_kinds:
+        raise ValueError(f"{cursor._kind_id} is not a valid CursorKind")
+
 
 class AbstractClangVisitor(object):
     ###
     # A Visitor class to traverse libclang cursors
     ###
 
+    __slots__ = ("_dispatch",)
+
+    # Mapping from cursor kind to the name of the "visit_<kind>" method
+    # for that kind, calculated once per class.
+    _visit_method_names: typing.Dict[int, str] = {}
+
+    def __init_subclass__(cls, **kwds: typing.Any) -> None:
+        super().__init_subclass__(**kwds)
+        cls._visit_method_names = {}
+        for name in dir(cls):
+            if not name.startswith("visit_"):
+                continue
+            try:
+                kind = clang.CursorKind[name[6:].upper()]
+            except KeyError:
+                continue
+            cls._visit_method_names[kind] = name
+
+    def __init__(self) -> None:
+        # Mapping from cursor kind to the bound "visit_<kind>" method for
+        # that kind, cursors of other kinds are passed to "descend".
+        self._dispatch: typing.Dict[int, typing.Callable[[clang.Cursor], None]] = {
+            kind: getattr(self, name) for kind, name in self._visit_method_names.items()
+        }
+
     def visitor_function_for_cursor(
         self, cursor: clang.Cursor
     ) -> typing.Callable[[clang.Cursor], None]:
-        method_name = "visit_" + cursor.kind.name.lower()
-        method = getattr(self, method_name, None)
-        if method is None:
-            method = self.descend
-        return method
+        visitor_function = self._dispatch.get(cursor._kind_id)
+        if visitor_function is None:
+            _check_cursor_kind(cursor)
+            return self.descend
+        return visitor_function
+
+    def should_visit(self, cursor: clang.Cursor) -> bool:
+        """
+        Return True if *cursor* should be visited, subclasses
+        can override this to skip uninteresting parts of the tree.
+        """
+        return True
 
     def visit(self, cursor: clang.Cursor) -> None:
+        if not self.should_visit(cursor):
+            return None
         visitor_function = self.visitor_function_for_cursor(cursor)
         return None if visitor_function is None else visitor_function(cursor)
 
     def descend(self, cursor: clang.Cursor) -> None:
-        for c in cursor.get_children():
-            self.visit(c)
+        # Walk the tree using an explicit stack of child iterators
+        # instead of recursing through "visit" for every cursor
+        # without a "visit_<kind>" method.
+        should_visit = self.should_visit
+        dispatch = self._dispatch
+        stack = [iter(cursor.get_children())]
+        while stack:
+            for child in stack[-1]:
+                if not should_visit(child):
+                    continue
+                visitor_function = dispatch.get(child._kind_id)
+                if visitor_function is None:
+                    _check_cursor_kind(child)
+                    stack.append(iter(child.get_children()))
+                    break
+                visitor_function(child)
+            else:
+                stack.pop()
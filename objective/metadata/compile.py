@@ -6,11 +6,12 @@ the metadata source file used by PyObjC.
 The metadata source file is a python file with a number of definitions
 that are used by the lazy loading functionality.
 """
-from __future__ import absolute_import
-
 import collections
+import functools
+import io
 import itertools
 import operator
+import sys
 import textwrap
 import time
 
@@ -56,6 +57,13 @@ class BStr(str):
         return "b" + super(BStr, self).__repr__()
 
 
+@functools.lru_cache(maxsize=8192, typed=True)
+def _bstr(value):
+    # Type encodings and selectors are a fairly small vocabulary,
+    # share the BStr instances for them.
+    return BStr(value)
+
+
 # noinspection PyProtectedMember
 class UStr(object):
     def __init__(self, value):
@@ -106,6 +114,8 @@ class UStr(object):
 
 
 class WrappedCall(object):
+    __slots__ = ("name", "args", "kwds")
+
     def __init__(self, name, args, kwds):
         self.name = name
         self.args = args
@@ -163,6 +173,8 @@ class WrappedCall(object):
 
 
 class FuncCall(object):
+    __slots__ = ("_func_name",)
+
     def __init__(self, func_name):
         self._func_name = func_name
 
@@ -172,50 +184,120 @@ class FuncCall(object):
 
 sel32or64 = FuncCall("sel32or64")
 littleOrBig = FuncCall("littleOrBig")
+objc_selector = FuncCall("objc.selector")
+objc_informal_protocol = FuncCall("objc.informal_protocol")
+objc_create_opaque_pointer_type = FuncCall("objc.createOpaquePointerType")
+objc_create_struct_type = FuncCall("objc.createStructType")
+objc_register_struct_alias = FuncCall("objc.registerStructAlias")
+objc_resolve_name = FuncCall("objc._resolve_name")
+
+
+# Sets of architectures that can be distinguished using
+# "littleOrBig" and "sel32or64".
+#
+# Note: "set in frozenset" works for a plain set as well,
+# the set is looked up as a frozenset.
+_little_endian_archs = frozenset(
+    (frozenset({"i386"}), frozenset({"x86_64"}), frozenset({"i386", "x86_64"}))
+)
+_big_endian_archs = frozenset(
+    (frozenset({"ppc"}), frozenset({"ppc64"}), frozenset({"ppc", "ppc64"}))
+)
+_32_bit_archs = frozenset(
+    (frozenset({"ppc"}), frozenset({"i386"}), frozenset({"ppc", "i386"}))
+)
+_64_bit_archs = frozenset(
+    (frozenset({"ppc64"}), frozenset({"x86_64"}), frozenset({"ppc64", "x86_64"}))
+)
 
 
 def _is_little_endian(archs):
-    return archs in ({"i386"}, {"x86_64"}, {"i386", "x86_64"})
+    return archs in _little_endian_archs
 
 
 def _is_big_endian(archs):
-    return archs in ({"ppc"}, {"ppc64"}, {"ppc", "ppc64"})
+    return archs in _big_endian_archs
 
 
 def _is_32_bit(archs):
-    return archs in ({"ppc"}, {"i386"}, {"ppc", "i386"})
+    return archs in _32_bit_archs
 
 
 def _is_64_bit(archs):
-    return archs in ({"ppc64"}, {"x86_64"}, {"ppc64", "x86_64"})
+    return archs in _64_bit_archs
 
 
-def classify_archs(archs1, archs2, value1, value2):
+def _classify_arch_sets(archs1, archs2):
+    """
+    Returns the function used to select between the values for
+    *archs1* and *archs2*, and a boolean that is True when the values
+    should be passed in reverse order, or None when the two
+    architecture sets cannot be distinguished.
+    """
     if _is_32_bit(archs1) and _is_64_bit(archs2):
-        return sel32or64(value1, value2)
+        return sel32or64, False
     elif _is_32_bit(archs2) and _is_64_bit(archs1):
-        return sel32or64(value2, value1)
+        return sel32or64, True
     elif _is_little_endian(archs1) and _is_big_endian(archs2):
-        return littleOrBig(value1, value2)
+        return littleOrBig, False
     elif _is_little_endian(archs2) and _is_big_endian(archs1):
-        return littleOrBig(value2, value1)
+        return littleOrBig, True
     else:
         return None
 
 
+# Classification for all pairs of known architecture sets, pairs
+# that are not in this table cannot be distinguished.
+_arch_classification = {}
+for _archs1, _archs2 in itertools.product(
+    _little_endian_archs | _big_endian_archs | _32_bit_archs | _64_bit_archs,
+    repeat=2,
+):
+    _classification = _classify_arch_sets(_archs1, _archs2)
+    if _classification is not None:
+        _arch_classification[(_archs1, _archs2)] = _classification
+del _archs1, _archs2, _classification
+
+
+def classify_archs(archs1, archs2, value1, value2):
+    try:
+        function, swapped = _arch_classification[(frozenset(archs1), frozenset(archs2))]
+    except KeyError:
+        return None
+
+    if swapped:
+        return function(value2, value1)
+    return function(value1, value2)
+
+
 def merge_defs(defs, key):
+    if len(defs) == 1:
+        # Only one definition, nothing to merge
+        return {key: defs[0][key]}
+
     # Uniq is logically a dict mapping from a value
     # to the set of architectures that use this value.
     # This cannot be a real dictionary because we sometimes
-    # the values used are not hashable.
+    # the values used are not hashable, "index" is used
+    # to avoid a linear search for hashable values.
     uniq = []
+    index = {}
     for d in defs:
-        for k, v in uniq:
-            if k == d[key]:
-                v.add(d["arch"])
-                break
-        else:
-            uniq.append((d[key], {d["arch"]}))
+        value = d[key]
+        try:
+            archs = index[value]
+        except KeyError:
+            archs = index[value] = set()
+            uniq.append((value, archs))
+        except TypeError:
+            for k, v in uniq:
+                if k == value:
+                    archs = v
+                    break
+            else:
+                archs = set()
+                uniq.append((value, archs))
+        archs.add(d["arch"])
 
     if len(uniq) == 1:
         return {key: uniq[0][0]}
@@ -231,77 +313,74 @@ def merge_defs(defs, key):
         raise MergeNeededException("Merge needed %r" % (uniq,))
 
 
+def _method_typestr(meth):
+    """
+    Return the full type encoding for method *meth*, including
+    the implicit "self" and "_cmd" arguments.
+    """
+    parts = [meth["retval"]["typestr"] if "retval" in meth else b"v", b"@:"]
+    parts.extend(a["typestr"] for a in meth["args"])
+    return b"".join(parts)
+
+
 def merge_definition_lists(defs):
-    all_methods = {}
+    all_methods = collections.defaultdict(list)
     for info in defs:
         arch = info["arch"]
         methods = info["methods"]
         for meth in methods:
-            try:
-                lst = all_methods[meth["selector"]]
-            except KeyError:
-                lst = all_methods[meth["selector"]] = []
-
-            if "retval" in meth:
-                typestr = meth["retval"]["typestr"]
-            else:
-                typestr = "v"
-            typestr += "@:"
-            for a in meth["args"]:
-                typestr += a["typestr"]
-            lst.append({"arch": arch, "typestr": typestr})
+            all_methods[meth["selector"]].append(
+                {"arch": arch, "typestr": _method_typestr(meth)}
+            )
 
     result = []
-    for selector, typestr in all_methods.items():
-        for v in typestr:
-            v["typestr"] = v["typestr"]
-        typestr = merge_defs(typestr, "typestr")["typestr"]
-        result.append(
-            FuncCall("objc.selector")(None, BStr(selector), typestr, isRequired=False)
-        )
+    for selector, definitions in all_methods.items():
+        typestr = merge_defs(definitions, "typestr")["typestr"]
+        result.append(objc_selector(None, _bstr(selector), typestr, isRequired=False))
 
     return result
 
 
+def _ignored_names(excinfo):
+    """
+    Return the names that are marked as ignored in *excinfo*
+    """
+    return frozenset(name for name, value in excinfo.items() if value.get("ignore"))
+
+
 def extract_informal_protocols(exceptions, headerinfo):
     found = {}
 
     excinfo = exceptions["definitions"].get("informal_protocols", {})
+    ignored = _ignored_names(excinfo)
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get("informal_protocols", {}).items():
-            if name in excinfo:
-                if excinfo[name].get("ignore", False):
-                    continue
+            if name in ignored:
+                continue
 
             if name not in found:
                 found[name] = []
 
-            found[name].append({"methods": value["methods"], "arch": info["arch"]})
+            found[name].append({"methods": value["methods"], "arch": arch})
 
-    informal_protocol = FuncCall("objc.informal_protocol")
-    selector = FuncCall("objc.selector")
     result = {}
 
     def calc_selector(meth):
-        if "retval" in meth:
-            typestr = meth["retval"]["typestr"]
-        else:
-            typestr = b"v"
-        typestr += b"@:"
-        for a in meth["args"]:
-            typestr += a["typestr"]
-        return selector(None, BStr(meth["selector"]), typestr, isRequired=False)
+        return objc_selector(
+            None, _bstr(meth["selector"]), _method_typestr(meth), isRequired=False
+        )
 
     for name in found:
         if len(found[name]) == 1:
-            result[name] = informal_protocol(
-                name, list(map(calc_selector, found[name][0]["methods"]))
+            result[name] = objc_informal_protocol(
+                name, [calc_selector(meth) for meth in found[name][0]["methods"]]
             )
 
         else:
-            merge_definition_lists(found[name])
-
-            result[name] = informal_protocol(name, merge_definition_lists(found[name]))
+            result[name] = objc_informal_protocol(
+                name, merge_definition_lists(found[name])
+            )
 
     return result
 
@@ -309,21 +388,21 @@ def extract_informal_protocols(exceptions, headerinfo):
 def _cleanup_callable_metadata(metadata):
     def cleanup_type(rec):
         if "typestr" in rec:
-            rec["type"] = rec["typestr"]
-            del rec["typestr"]
-        elif "type_override" in val:
-            rec["type"] = rec["type_override"]
-            del rec["type_override"]
-
-        if isinstance(rec["type"], (list, tuple)):
-            if isinstance(rec["type"][1], bool):
-                # Correct scanner stores 'typestr_special' in wrong location
-                rec["type"] = rec["type"][0]
-
-        if isinstance(rec["type"], (list, tuple)):
-            rec["type"] = sel32or64(*rec["type"])
-        else:
-            rec["type"] = rec["type"]
+            rec["type"] = rec.pop("typestr")
+        elif "type_override" in rec:
+            rec["type"] = rec.pop("type_override")
+
+        type_value = rec["type"]
+        if not isinstance(type_value, (list, tuple)):
+            # Common case: a plain type encoding
+            return rec
+
+        if isinstance(type_value[1], bool):
+            # Correct scanner stores 'typestr_special' in wrong location
+            type_value = rec["type"] = type_value[0]
+
+        if isinstance(type_value, (list, tuple)):
+            rec["type"] = sel32or64(*type_value)
         return rec
 
     metadata["retval"] = cleanup_type(dict(metadata["retval"]))
@@ -456,25 +535,21 @@ def calc_func_proto(exc, info, arch):
 
 
 def extract_functions(exceptions, headerinfo):
-    functions = {}
+    functions = collections.defaultdict(list)
     excinfo = exceptions["definitions"].get("functions", {})
+    ignored = _ignored_names(excinfo)
 
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get("functions", {}).items():
-            if name in excinfo:
-                if excinfo[name].get("ignore", False):
-                    continue
+            if name in ignored:
+                continue
 
             print(name)
-            typestr, metadata = calc_func_proto(
-                excinfo.get(name, {}), value, info["arch"]
-            )
-            value = {"typestr": typestr, "metadata": metadata, "arch": info["arch"]}
+            typestr, metadata = calc_func_proto(excinfo.get(name, {}), value, arch)
+            value = {"typestr": typestr, "metadata": metadata, "arch": arch}
 
-            try:
-                functions[name].append(value)
-            except KeyError:
-                functions[name] = [value]
+            functions[name].append(value)
 
     for name, value in excinfo.items():
         if name in functions:
@@ -504,25 +579,25 @@ def extract_opaque(exceptions):
     excinfo = exceptions["definitions"].get("opaque", {})
 
     opaque = {}
-    create_pointer = FuncCall("objc.createOpaquePointerType")
     for name, info in excinfo.items():
         if "typestr" not in info:
             print("WARNING: Skip %r, no typestr found" % (name,))
             continue
 
-        opaque[name] = create_pointer(name, info["typestr"])
+        opaque[name] = objc_create_opaque_pointer_type(name, info["typestr"])
 
     return opaque
 
 
 def extract_opaque_cftypes(exceptions, headerinfo):
-    cftypes = {}
+    cftypes = collections.defaultdict(list)
     excinfo = exceptions["definitions"].get("cftypes", {})
 
     # This is a naive fix for some unclear code
     last_info_arch = None
 
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get("cftypes", {}).items():
             if name in excinfo:
                 if excinfo[name].get("ignore", False):
@@ -533,13 +608,8 @@ def extract_opaque_cftypes(exceptions, headerinfo):
                 # Not in exception data, cannot be 'opaque pointer'
                 continue
 
-            try:
-                lst = cftypes[name]
-            except KeyError:
-                lst = cftypes[name] = []
-
-            lst.append({"typestr": value["typestr"], "arch": info["arch"]})
-            last_info_arch = info["arch"]
+            cftypes[name].append({"typestr": value["typestr"], "arch": arch})
+            last_info_arch = arch
 
     for name, value in excinfo.items():
         if name in cftypes:
@@ -555,19 +625,19 @@ def extract_opaque_cftypes(exceptions, headerinfo):
         cftypes[name] = [{"typestr": value["typestr"], "arch": last_info_arch}]
 
     result = {}
-    create_pointer = FuncCall("objc.createOpaquePointerType")
     for name, values in sorted(cftypes.items()):
         typestr = merge_defs(values, "typestr")["typestr"]
-        result[name] = create_pointer(name, typestr)
+        result[name] = objc_create_opaque_pointer_type(name, typestr)
 
     return result
 
 
 def extract_aliases(exceptions, headerinfo):
-    aliases = {}
+    aliases = collections.defaultdict(list)
     excinfo = exceptions["definitions"].get("aliases", {})
 
     for info in headerinfo:
+        arch = info["arch"]
         for orig, alias in info["definitions"].get("aliases", {}).items():
             if orig in excinfo:
                 if excinfo[orig].get("ignore", False):
@@ -576,12 +646,7 @@ def extract_aliases(exceptions, headerinfo):
                 if v is not None:
                     alias = v
 
-            try:
-                lst = aliases[orig]
-            except KeyError:
-                lst = aliases[orig] = []
-
-            lst.append({"alias": alias, "arch": info["arch"]})
+            aliases[orig].append({"alias": alias, "arch": arch})
 
     result = {}
     for name, values in sorted(aliases.items()):
@@ -604,10 +669,11 @@ def extract_aliases(exceptions, headerinfo):
 
 
 def extract_cftypes(exceptions, headerinfo):
-    cftypes = {}
+    cftypes = collections.defaultdict(list)
     excinfo = exceptions["definitions"].get("cftypes", {})
 
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get("cftypes", {}).items():
             if name in excinfo:
                 if excinfo[name].get("ignore", False):
@@ -615,12 +681,7 @@ def extract_cftypes(exceptions, headerinfo):
                 if excinfo[name].get("opaque", False):
                     continue
 
-            try:
-                lst = cftypes[name]
-            except KeyError:
-                lst = cftypes[name] = []
-
-            lst.append({"typestr": value["typestr"], "arch": info["arch"]})
+            cftypes[name].append({"typestr": value["typestr"], "arch": arch})
 
     result = []
     for name, values in sorted(cftypes.items()):
@@ -650,19 +711,16 @@ def extract_expressions(exceptions, headerinfo):
     result = {}
 
     excinfo = exceptions["definitions"].get("expressions", {})
+    ignored = _ignored_names(excinfo)
 
     # Add all definitions from parsed header files
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get("expressions", {}).items():
-            if name in excinfo:
-                if excinfo[name].get("ignore", False):
-                    continue
-
-            if name in result:
-                result[name].append({"value": value, "arch": info["arch"]})
+            if name in ignored:
+                continue
 
-            else:
-                result[name] = [{"value": value, "arch": info["arch"]}]
+            result.setdefault(name, []).append({"value": value, "arch": arch})
 
     # Finally add definitions that were manually added to  the exceptions file
     for name in excinfo:
@@ -682,6 +740,7 @@ def extract_externs(exceptions, headerinfo):
 
     # Add all definitions from parsed header files
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get("externs", {}).items():
             if name in excinfo:
                 if excinfo[name].get("ignore", False):
@@ -694,11 +753,7 @@ def extract_externs(exceptions, headerinfo):
             if typestr == "^{__CFString}":
                 typestr = "@"
 
-            if name in result:
-                result[name].append({"typestr": typestr, "arch": info["arch"]})
-
-            else:
-                result[name] = [{"typestr": typestr, "arch": info["arch"]}]
+            result.setdefault(name, []).append({"typestr": typestr, "arch": arch})
 
     # Finally add definitions that were manually added to  the exceptions file
     for name in excinfo:
@@ -724,6 +779,7 @@ def extract_enums(exceptions, headerinfo):
     excinfo = exceptions["definitions"].get("enum", {})
 
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get("enum", {}).items():
             if name in excinfo:
                 if excinfo[name].get("ignore", False):
@@ -731,25 +787,19 @@ def extract_enums(exceptions, headerinfo):
                 if excinfo[name].get("value"):
                     if isinstance(excinfo[name]["value"], str):
                         result[name] = [
-                            {"value": BStr(excinfo[name]["value"]), "arch": None}
+                            {"value": _bstr(excinfo[name]["value"]), "arch": None}
                         ]
                     else:
                         result[name] = [{"value": excinfo[name]["value"], "arch": None}]
                     continue
 
                 if excinfo[name].get("type") == "unicode":
-                    if name in result:
-                        result[name].append({"value": chr(value), "arch": info["arch"]})
-
-                    else:
-                        result[name] = [{"value": chr(value), "arch": info["arch"]}]
+                    result.setdefault(name, []).append(
+                        {"value": chr(value), "arch": arch}
+                    )
                     continue
 
-            if name in result:
-                result[name].append({"value": value, "arch": info["arch"]})
-
-            else:
-                result[name] = [{"value": value, "arch": info["arch"]}]
+            result.setdefault(name, []).append({"value": value, "arch": arch})
 
     # Finally add definitions that were manually added to  the exceptions file
     for name in excinfo:
@@ -773,20 +823,29 @@ def extract_enums(exceptions, headerinfo):
     return result
 
 
-def exception_method(exceptions, key):
-    for m in exceptions.get(key[0], {"methods": ()}).get("methods", ()):
-        if m["selector"] == key[1] and m["class_method"] == key[2]:
-            return m
-    return None
+def exception_methods(exceptions):
+    """
+    Returns a mapping from (class, selector, class_method) to the
+    exception data for that method.
+    """
+    result = {}
+    for clsname, info in exceptions.items():
+        for m in info.get("methods", ()):
+            # The first definition in the exception data wins
+            result.setdefault((clsname, m["selector"], m["class_method"]), m)
+    return result
 
 
 def merge_arginfo(current, update, arch, only_special):
     if "typestr_special" in update:
         if update["typestr_special"] or not only_special:
-            if "type" not in current:
-                current["type"] = collections.defaultdict(list)
-
-            current["type"][update["typestr"]].append(arch)
+            # Mapping from type encoding to the architectures using it,
+            # in the common case there is only one encoding.
+            types = current.get("type")
+            if types is None:
+                current["type"] = {update["typestr"]: [arch]}
+            else:
+                types.setdefault(update["typestr"], []).append(arch)
 
     for k in update:
         if k not in ("typestr", "typestr_special"):
@@ -794,33 +853,100 @@ def merge_arginfo(current, update, arch, only_special):
 
 
 def calc_type(choices):
+    if type(choices) is dict and len(choices) == 1:
+        # Common case: a single type encoding from merge_arginfo
+        (typestr,) = choices
+        return _bstr(typestr)
+
     if isinstance(choices, str):
         # investigate why this is needed (Collabortation wrappers)
         return choices
     if len(choices) == 1:
-        return BStr(next(iter(choices)))
+        return _bstr(next(iter(choices)))
 
     else:
         if isinstance(choices, list):
-            return sel32or64(*[BStr(ch) for ch in choices])
+            return sel32or64(*[_bstr(ch) for ch in choices])
 
         else:
             ch = []
             for k, v in choices.items():
                 for e in v:
-                    ch.append({"value": BStr(k), "arch": e})
+                    ch.append({"value": _bstr(k), "arch": e})
 
             return merge_defs(ch, "value")["value"]
 
 
+def _is_trivial_arginfo(arginfo, only_special):
+    """
+    Returns True iff ``merge_arginfo`` won't add information for *arginfo*
+    """
+    for k in arginfo:
+        if k == "typestr_special":
+            if arginfo[k] or not only_special:
+                return False
+        elif k != "typestr":
+            return False
+    return True
+
+
+def _is_trivial_method_info(info, only_special):
+    """
+    Returns True iff ``merge_method_info`` will return None for a method
+    that only has the scanned information in *info*.
+    """
+    for k in info:
+        if k in ("class", "selector", "class_method", "arch", "visibility"):
+            continue
+
+        elif k == "retval":
+            if not _is_trivial_arginfo(info[k], only_special):
+                return False
+
+        elif k == "args":
+            for value in info[k]:
+                if not _is_trivial_arginfo(value, only_special):
+                    return False
+
+        else:
+            return False
+
+    return True
+
+
+def _arginfo_records(metadata):
+    """
+    Returns the return value and argument records of *metadata*,
+    the return value record is an empty dict when there is none.
+    """
+    records = [metadata.get("retval", {})]
+    records.extend(metadata.get("arguments", {}).values())
+    return records
+
+
+# Merged metadata for a single method, as emitted by ``emit_method_info``
+MethodRecord = collections.namedtuple(
+    "MethodRecord", ["clsname", "selector", "class_method", "metadata"]
+)
+
+
 def merge_method_info(
     clsname, selector, class_method, infolist, exception, only_special
 ):
     """
     Merge method metadata and exceptions and return the resulting
-    information dictionary. Returns ``None`` when there is no information
+    ``MethodRecord``. Returns ``None`` when there is no information
     that couldn't be loaded at runtime by the bridge.
     """
+    if (
+        exception is None
+        and len(infolist) == 1
+        and _is_trivial_method_info(infolist[0], only_special)
+    ):
+        # Fast path for the common case: a method without exception data
+        # and nothing interesting in the scanned data.
+        return None
+
     result = {"arguments": {}}
     for info in infolist:
         for k in info:
@@ -885,9 +1011,7 @@ def merge_method_info(
             else:
                 result[k] = exception[k]
 
-        for rec in itertools.chain(
-            [result.get("retval", {})], result.get("arguments", {}).values()
-        ):
+        for rec in _arginfo_records(result):
             if "c_array_length_in_arg" in rec:
                 v = rec["c_array_length_in_arg"]
                 if isinstance(v, (list, tuple)):
@@ -921,10 +1045,7 @@ def merge_method_info(
 
         if "callable" in result["retval"]:
             this_callable = result["retval"]["callable"]
-            for value in itertools.chain(
-                [this_callable.get("retval", {})],
-                this_callable.get("arguments", {}).values(),
-            ):
+            for value in _arginfo_records(this_callable):
                 if isinstance(value["type"], str):
                     value["type"] = value["type"]
                 else:
@@ -947,10 +1068,7 @@ def merge_method_info(
 
             if "callable" in a:
                 this_callable = a["callable"]
-                for value in itertools.chain(
-                    [this_callable.get("retval", {})],
-                    this_callable.get("arguments", {}).values(),
-                ):
+                for value in _arginfo_records(this_callable):
                     if "type" not in value:
                         raise ValueError(
                             "Missing 'type' in argument/retval spec for %s %s"
@@ -973,29 +1091,19 @@ def merge_method_info(
     if not result:
         return None
 
-    return {
-        "class": clsname,
-        "selector": selector,
-        "class_method": class_method,
-        "metadata": result,
-    }
+    return MethodRecord(clsname, selector, class_method, result)
 
 
 def extract_method_info(exceptions, headerinfo, section="classes"):
-    result = {}
+    result = collections.defaultdict(list)
     excinfo = exceptions["definitions"].get("classes", {})
 
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get(section, {}).items():
             for meth in value.get("methods", ()):
                 key = (name, meth["selector"], meth["class_method"])
-                if key in result:
-                    result[key].append(dict(meth))
-                else:
-                    result[key] = [dict(meth)]
-
-                result[key][-1]["arch"] = info["arch"]
-                result[key][-1]["class"] = name
+                result[key].append({**meth, "arch": arch, "class": name})
 
             for prop in value.get("properties", ()):
                 # Properties have a getter and optionally a setter method,
@@ -1020,13 +1128,10 @@ def extract_method_info(exceptions, headerinfo, section="classes"):
                         },
                         "args": [],
                         "class_method": False,
+                        "arch": arch,
+                        "class": name,
                     }
-                    if key in result:
-                        result[key].append(dict(meth))
-                    else:
-                        result[key] = [dict(meth)]
-                    result[key][-1]["arch"] = info["arch"]
-                    result[key][-1]["class"] = name
+                    result[key].append(meth)
 
                 if setter:
                     key = (name, setter, False)
@@ -1040,14 +1145,12 @@ def extract_method_info(exceptions, headerinfo, section="classes"):
                             }
                         ],
                         "class_method": False,
+                        "arch": arch,
+                        "class": name,
                     }
-                    if key in result:
-                        result[key].append(dict(meth))
-                    else:
-                        result[key] = [dict(meth)]
-                    result[key][-1]["arch"] = info["arch"]
-                    result[key][-1]["class"] = name
+                    result[key].append(meth)
 
+    excmethods = exception_methods(excinfo)
     for key in list(result):
         if section != "classes":
             use_key = ("NSObject",) + key[1:]
@@ -1060,7 +1163,7 @@ def extract_method_info(exceptions, headerinfo, section="classes"):
             key[1],
             key[2],
             result[key],
-            exception_method(excinfo, use_key),
+            excmethods.get(use_key),
             section == "classes",
         )
 
@@ -1082,34 +1185,31 @@ def extract_method_info(exceptions, headerinfo, section="classes"):
 
     result = [info for info in result.values() if info is not None]
     if section != "classes":
-        for item in result:
-            item["class"] = "NSObject"
+        result = [item._replace(clsname="NSObject") for item in result]
 
     return result
 
 
 def extract_structs(exceptions, headerinfo):
     excinfo = exceptions["definitions"].get("structs", {})
-    create_struct_type = FuncCall("objc.createStructType")
-    register_struct_alias = FuncCall("objc.registerStructAlias")
-    get_name = FuncCall("objc._resolve_name")
+    ignored = _ignored_names(excinfo)
 
-    structs = {}
+    structs = collections.defaultdict(list)
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get("structs", {}).items():
-            if name in excinfo and excinfo[name].get("ignore", False):
+            if name in ignored:
                 continue
 
-            alias = None
-            pack = None
-            fieldnames = value["fieldnames"]
-            if name in excinfo:
-                fieldnames = [(x,) for x in excinfo[name].get("fieldnames", fieldnames)]
-                alias = excinfo[name].get("alias", None)
-                pack = excinfo[name].get("pack", None)
-
-            if name not in structs:
-                structs[name] = []
+            exc = excinfo.get(name)
+            if exc is None:
+                fieldnames = value["fieldnames"]
+                alias = None
+                pack = None
+            else:
+                fieldnames = [(x,) for x in exc.get("fieldnames", value["fieldnames"])]
+                alias = exc.get("alias", None)
+                pack = exc.get("pack", None)
 
             structs[name].append(
                 {
@@ -1117,15 +1217,13 @@ def extract_structs(exceptions, headerinfo):
                     "fieldnames": fieldnames,
                     "alias": alias,
                     "pack": pack,
-                    "arch": info["arch"],
+                    "arch": arch,
                 }
             )
 
     result = {}
     for name, values in structs.items():
         fieldnames = values[0]["fieldnames"]
-        for v in values:
-            v["typestr"] = v["typestr"]
         print(name)
         typestr = merge_defs(values, "typestr")["typestr"]
         alias = values[0]["alias"]
@@ -1139,11 +1237,13 @@ def extract_structs(exceptions, headerinfo):
 
         if alias is None:
             if pack is None:
-                result[name] = create_struct_type(name, typestr, fieldnames)
+                result[name] = objc_create_struct_type(name, typestr, fieldnames)
             else:
-                result[name] = create_struct_type(name, typestr, fieldnames, None, pack)
+                result[name] = objc_create_struct_type(
+                    name, typestr, fieldnames, None, pack
+                )
         else:
-            result[name] = register_struct_alias(typestr, get_name(alias))
+            result[name] = objc_register_struct_alias(typestr, objc_resolve_name(alias))
 
     return result
 
@@ -1209,11 +1309,19 @@ def emit_method_info(fp, method_info):
         fp.write("objc._updatingMetadata(True)\n")
         fp.write("try:\n")
 
-        for record in sorted(method_info, key=operator.itemgetter("class", "selector")):
-            fp.write(
+        fp.write(
+            "".join(
                 "    r(%r, %r, %r)\n"
-                % (BStr(record["class"]), BStr(record["selector"]), record["metadata"])
+                % (
+                    _bstr(record.clsname),
+                    _bstr(record.selector),
+                    record.metadata,
+                )
+                for record in sorted(
+                    method_info, key=operator.attrgetter("clsname", "selector")
+                )
             )
+        )
 
         fp.write("finally:\n")
         fp.write("    objc._updatingMetadata(False)\n")
@@ -1241,16 +1349,17 @@ def emit_opaque(fp, opaque):
 
 def extract_literal(exceptions, headerinfo):
     excinfo = exceptions["definitions"].get("literals", {})
+    ignored = _ignored_names(excinfo)
 
     found = {}
     for info in headerinfo:
+        arch = info["arch"]
         for name, value in info["definitions"].get("literals", {}).items():
-            if name in excinfo and excinfo[name].get("ignore", False):
+            if name in ignored:
                 continue
 
-            is_unicode = False
-            if name in excinfo and excinfo[name].get("unicode", False):
-                is_unicode = True
+            exc = excinfo.get(name)
+            is_unicode = exc is not None and bool(exc.get("unicode", False))
 
             if isinstance(value, dict):
                 if value.get("unicode", False):
@@ -1260,19 +1369,19 @@ def extract_literal(exceptions, headerinfo):
                     if is_unicode:
                         value = UStr(value["value"])
                     else:
-                        value = BStr(value["value"])
+                        value = _bstr(value["value"])
 
             else:
                 if isinstance(value, str):
                     if is_unicode:
                         value = UStr(value)
                     else:
-                        value = BStr(value)
+                        value = _bstr(value)
 
             if name not in found:
                 found[name] = []
 
-            found[name].append({"value": value, "arch": info["arch"]})
+            found[name].append({"value": value, "arch": arch})
 
     result = {}
     for k, v in found.items():
@@ -1295,6 +1404,20 @@ def emit_aliases(fp, aliases):
         print("aliases = %r" % (aliases,), file=fp)
 
 
+def _load_headerinfo(headerinfo_fns):
+    """
+    Load the scan results in *headerinfo_fns*
+    """
+    headerinfo = [load_framework_info(fn) for fn in headerinfo_fns]
+
+    # The architecture names are used a lot as set members and
+    # dictionary keys while merging.
+    for info in headerinfo:
+        info["arch"] = sys.intern(info["arch"])
+
+    return headerinfo
+
+
 def compile_metadata(output_fn, exceptions_fn, headerinfo_fns):
     """
     Combine the data from header files scans and manual exceptions
@@ -1305,26 +1428,31 @@ def compile_metadata(output_fn, exceptions_fn, headerinfo_fns):
         exceptions = load_framework_info(exceptions_fn)
     except FileNotFoundError:
         exceptions = {"definitions": {}}
-    headerinfo = [load_framework_info(fn) for fn in headerinfo_fns]
-    with open(output_fn, "w") as fp:
-        fp.write(HEADER % {"timestamp": time.ctime()})
-
-        emit_structs(fp, extract_structs(exceptions, headerinfo))
-        emit_externs(fp, extract_externs(exceptions, headerinfo))
-        emit_enums(fp, extract_enums(exceptions, headerinfo))
-        emit_literal(fp, extract_literal(exceptions, headerinfo))
-        emit_functions(fp, extract_functions(exceptions, headerinfo))
-        emit_aliases(fp, extract_aliases(exceptions, headerinfo))
-        emit_cftypes(fp, extract_cftypes(exceptions, headerinfo))
-        emit_opaque(fp, extract_opaque_cftypes(exceptions, headerinfo))
-        emit_opaque(fp, extract_opaque(exceptions))
-        emit_method_info(fp, extract_method_info(exceptions, headerinfo))
-        emit_method_info(
-            fp, extract_method_info(exceptions, headerinfo, "formal_protocols")
-        )
-        emit_method_info(
-            fp, extract_method_info(exceptions, headerinfo, "informal_protocols")
-        )
-        emit_informal_protocols(fp, extract_informal_protocols(exceptions, headerinfo))
-        emit_expressions(fp, extract_expressions(exceptions, headerinfo))
-        fp.write(FOOTER)
+    headerinfo = _load_headerinfo(headerinfo_fns)
+    # Generate the output in memory and write it out in one go, this
+    # also avoids leaving a partial file behind when compilation fails.
+    fp = io.StringIO()
+    fp.write(HEADER % {"timestamp": time.ctime()})
+
+    emit_structs(fp, extract_structs(exceptions, headerinfo))
+    emit_externs(fp, extract_externs(exceptions, headerinfo))
+    emit_enums(fp, extract_enums(exceptions, headerinfo))
+    emit_literal(fp, extract_literal(exceptions, headerinfo))
+    emit_functions(fp, extract_functions(exceptions, headerinfo))
+    emit_aliases(fp, extract_aliases(exceptions, headerinfo))
+    emit_cftypes(fp, extract_cftypes(exceptions, headerinfo))
+    emit_opaque(fp, extract_opaque_cftypes(exceptions, headerinfo))
+    emit_opaque(fp, extract_opaque(exceptions))
+    emit_method_info(fp, extract_method_info(exceptions, headerinfo))
+    emit_method_info(
+        fp, extract_method_info(exceptions, headerinfo, "formal_protocols")
+    )
+    emit_method_info(
+        fp, extract_method_info(exceptions, headerinfo, "informal_protocols")
+    )
+    emit_informal_protocols(fp, extract_informal_protocols(exceptions, headerinfo))
+    emit_expressions(fp, extract_expressions(exceptions, headerinfo))
+    fp.write(FOOTER)
+
+    with open(output_fn, "w") as stream:
+        stream.write(fp.getvalue())
@@ -119,6 +119,9 @@ class FrameworkParser(object):
 
         self.headers: typing.Set[str] = util.sorted_set()
 
+        # Cache for should_process_cursor: file name -> in framework
+        self._framework_files: typing.Dict[str, bool] = {}
+
         self.meta = FrameworkMetadata(
             sdk_version=".".join(str(x) for x in sdk_ver_from_path(self.sdk))
         )
@@ -360,15 +363,9 @@ class FrameworkParser(object):
         if cursor.kind == CursorKind.TRANSLATION_UNIT:
             return True
 
-        framework_dir = self.framework_path
         while cursor and cursor.kind != CursorKind.TRANSLATION_UNIT:
             node_file = cursor.location.file
-            if node_file and framework_dir in node_file.name:
-                # make a note of it in our headers list, unless it's
-                # the umbrella headers
-                base_name = os.path.basename(node_file.name)
-                if base_name != os.path.basename(self.start_header):
-                    self.headers.add(base_name)
+            if node_file and self._is_framework_file(node_file.name):
                 # descend
                 return True
             else:
@@ -377,6 +374,29 @@ class FrameworkParser(object):
 
         return False
 
+    def _is_framework_file(self, file_name: str) -> bool:
+        """
+        Return True iff ``file_name`` is a header in the current framework.
+
+        The result is cached because all cursors in a header end up
+        checking the same file.
+        """
+        try:
+            return self._framework_files[file_name]
+        except KeyError:
+            pass
+
+        result = self.framework_path in file_name
+        if result:
+            # make a note of it in our headers list, unless it's
+            # the umbrella headers
+            base_name = os.path.basename(file_name)
+            if base_name != os.path.basename(self.start_header):
+                self.headers.add(base_name)
+
+        self._framework_files[file_name] = result
+        return result
+
     def add_alias(self, alias: str, value: str) -> None:
         assert isinstance(alias, str)
         assert isinstance(value, str)
@@ -626,7 +646,7 @@ class FrameworkParser(object):
 
             # write back qualifiers
             encode_str = qualifiers.to_encode_string()
-            if encode_str != "":
+            if encode_str:
                 arginfo = replace(arginfo, type_modifier=encode_str)
 
             # add the arginfo to the args array
@@ -1313,8 +1333,7 @@ class FrameworkParser(object):
 
         result = CallbackInfo(retval=return_info, args=[])
 
-        arg_types_iter = thing.argument_types()
-        arg_types = [] if arg_types_iter is None else list(arg_types_iter)
+        arg_types = thing.argument_types()
 
         if thing.is_function_variadic():
             result = replace(result, variadic=True)
@@ -1382,8 +1401,7 @@ class FrameworkParser(object):
 
         result = CallbackInfo2(retval=return_info, args=[])
 
-        arg_types_iter = thing.argument_types()
-        arg_types = [] if arg_types_iter is None else list(arg_types_iter)
+        arg_types = thing.argument_types()
 
         if thing.is_function_variadic():
             result = replace(result, variadic=True)
@@ -2159,10 +2177,13 @@ class DefinitionVisitor(AbstractClangVisitor):
     locates interesting definitions.
     """
 
+    __slots__ = ("_parser", "__all_structs")
+
     def __init__(self, parser: FrameworkParser):
         if parser is None:
             raise ValueError(parser)
 
+        super().__init__()
         self._parser = parser
         # Record all records seen in header files, even
         # if they are not in a framework we're scanning.
@@ -2171,11 +2192,8 @@ class DefinitionVisitor(AbstractClangVisitor):
         # headers on x86_64)
         self.__all_structs: typing.Dict[str, Type] = {}
 
-    def visit(self, node: Cursor) -> None:
-        if not self._parser.should_process_cursor(node):
-            return
-
-        super(DefinitionVisitor, self).visit(node)
+    def should_visit(self, node: Cursor) -> bool:
+        return self._parser.should_process_cursor(node)
 
     def visit_var_decl(self, node: Cursor) -> None:
         linkage = node.linkage
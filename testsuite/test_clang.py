@@ -0,0 +1,164 @@
+import sys
+import unittest
+from unittest import mock
+
+import objc
+from objective.metadata import clang
+
+# Importing parsing configures the location of libclang
+from objective.metadata import parsing  # isort:skip  # noqa: F401
+
+SOURCE = b"""\
+@interface Foo {
+    int a;
+@public
+    int b;
+@private
+    int c;
+}
+@end
+
+@protocol Proto
+@optional
+- (void)optionalMethod;
+@required
+- (void)requiredMethod;
+@end
+
+int function(int x, double y);
+int variadic(int x, ...);
+static int variable;
+"""
+
+
+class TestObjCDeclQualifier(unittest.TestCase):
+    def test_from_encode_string(self):
+        encoded = objc._C_IN + objc._C_ONEWAY
+        for value in (encoded, encoded.decode()):
+            with self.subTest(value):
+                self.assertEqual(
+                    clang.ObjCDeclQualifier.from_encode_string(value),
+                    clang.ObjCDeclQualifier.IN | clang.ObjCDeclQualifier.ONEWAY,
+                )
+
+        for value in (None, b"", "", b"@", "@"):
+            with self.subTest(value):
+                self.assertEqual(
+                    clang.ObjCDeclQualifier.from_encode_string(value),
+                    clang.ObjCDeclQualifier(0),
+                )
+
+        with self.subTest("invalid type"):
+            with self.assertRaises(TypeError):
+                clang.ObjCDeclQualifier.from_encode_string(42)
+
+    def test_to_encode_string(self):
+        self.assertEqual(clang.ObjCDeclQualifier(0).to_encode_string(), b"")
+        self.assertEqual(clang.ObjCDeclQualifier.OUT.to_encode_string(), objc._C_OUT)
+
+        value = clang.ObjCDeclQualifier.IN | clang.ObjCDeclQualifier.BYCOPY
+        self.assertIsInstance(value.to_encode_string(), bytes)
+        self.assertEqual(
+            clang.ObjCDeclQualifier.from_encode_string(value.to_encode_string()), value
+        )
+
+
+class TestParsedSource(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tu = clang.Index.create().parse(
+            "source.m",
+            args=["-x", "objective-c"],
+            unsaved_files=[("source.m", SOURCE)],
+        )
+        cls.cursors = {
+            cursor.spelling: cursor
+            for cursor in cls.tu.cursor.get_children()
+            if cursor.location.file is not None
+        }
+
+    def test_interned_identifiers(self):
+        cursor = self.cursors["function"]
+        self.assertIs(cursor.spelling, sys.intern("function"))
+        self.assertIs(cursor.displayname, sys.intern("function(int, double)"))
+
+    def test_argument_types(self):
+        with self.subTest("function"):
+            self.assertEqual(
+                [arg.kind for arg in self.cursors["function"].type.argument_types()],
+                [clang.TypeKind.INT, clang.TypeKind.DOUBLE],
+            )
+
+        with self.subTest("not a function"):
+            self.assertEqual(self.cursors["variable"].type.argument_types(), ())
+
+    def test_access_specifier(self):
+        ivars = {
+            cursor.spelling: cursor
+            for cursor in self.cursors["Foo"].get_children()
+            if cursor.kind == clang.CursorKind.OBJC_IVAR_DECL
+        }
+        self.assertEqual(
+            {name: cursor.access_specifier for name, cursor in ivars.items()},
+            {"a": "protected", "b": "public", "c": "private"},
+        )
+
+        # The tokens of the interface are scanned once for all ivars
+        self.assertEqual(len(self.tu._access_levels), 1)
+        access_levels = next(iter(self.tu._access_levels.values()))
+        self.assertEqual(ivars["b"].access_specifier, "public")
+        self.assertIs(next(iter(self.tu._access_levels.values())), access_levels)
+
+        self.assertIsNone(self.cursors["variable"].access_specifier)
+
+    def test_cached_properties(self):
+        methods = {
+            cursor.spelling: cursor for cursor in self.cursors["Proto"].get_children()
+        }
+
+        for cursor, attribute, function, expected in (
+            (
+                self.cursors["function"],
+                "linkage",
+                "clang_getCursorLinkage",
+                clang.LinkageKind.EXTERNAL,
+            ),
+            (
+                self.cursors["variable"],
+                "linkage",
+                "clang_getCursorLinkage",
+                clang.LinkageKind.INTERNAL,
+            ),
+            (
+                self.cursors["function"],
+                "is_variadic",
+                "clang_Cursor_isVariadic",
+                False,
+            ),
+            (self.cursors["variadic"], "is_variadic", "clang_Cursor_isVariadic", True),
+            (
+                self.cursors["function"],
+                "is_virtual",
+                "clang_CXXMethod_isVirtual",
+                False,
+            ),
+            (
+                methods["optionalMethod"],
+                "is_optional_for_protocol",
+                "clang_Cursor_isObjCOptional",
+                True,
+            ),
+            (
+                methods["requiredMethod"],
+                "is_optional_for_protocol",
+                "clang_Cursor_isObjCOptional",
+                False,
+            ),
+        ):
+            with self.subTest(cursor=cursor.spelling, attribute=attribute):
+                self.assertEqual(getattr(cursor, attribute), expected)
+
+                # The second access uses the value cached on the cursor
+                with mock.patch.object(clang.conf.lib, function) as libfunc:
+                    self.assertEqual(getattr(cursor, attribute), expected)
+                libfunc.assert_not_called()
@@ -0,0 +1,50 @@
+import unittest
+from unittest import mock
+
+from objective.metadata import clang, clanghelpers
+
+
+def make_cursor(kind_id):
+    cursor = clang.Cursor()
+    cursor._kind_id = kind_id
+    return cursor
+
+
+class StructVisitor(clanghelpers.AbstractClangVisitor):
+    def visit_struct_decl(self, node):
+        pass
+
+
+class TestAbstractClangVisitor(unittest.TestCase):
+    def test_visitor_function_for_cursor(self):
+        visitor = StructVisitor()
+
+        with self.subTest("visit method"):
+            self.assertEqual(
+                visitor.visitor_function_for_cursor(
+                    make_cursor(clang.CursorKind.STRUCT_DECL)
+                ),
+                visitor.visit_struct_decl,
+            )
+
+        with self.subTest("no visit method"):
+            self.assertEqual(
+                visitor.visitor_function_for_cursor(
+                    make_cursor(clang.CursorKind.UNION_DECL)
+                ),
+                visitor.descend,
+            )
+
+        with self.subTest("unknown kind"):
+            unknown = max(clang.CursorKind) + 1000
+            with self.assertRaises(ValueError):
+                visitor.visitor_function_for_cursor(make_cursor(unknown))
+
+    def test_descend_unknown_kind(self):
+        visitor = StructVisitor()
+        unknown = max(clang.CursorKind) + 1000
+        with mock.patch.object(
+            clang.Cursor, "get_children", return_value=[make_cursor(unknown)]
+        ):
+            with self.assertRaises(ValueError):
+                visitor.descend(make_cursor(clang.CursorKind.UNION_DECL))
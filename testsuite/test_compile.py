@@ -0,0 +1,149 @@
+import itertools
+import unittest
+
+from objective.metadata import compile
+
+
+def method(selector, *arg_types, retval=None):
+    result = {"selector": selector, "args": [{"typestr": t} for t in arg_types]}
+    if retval is not None:
+        result["retval"] = {"typestr": retval}
+    return result
+
+
+class TestMergeDefinitionLists(unittest.TestCase):
+    def test_same_encoding(self):
+        self.assertEqual(
+            compile.merge_definition_lists(
+                [
+                    {"arch": "x86_64", "methods": [method("foo:", b"@", retval=b"v")]},
+                    {"arch": "arm64", "methods": [method("foo:", b"@", retval=b"v")]},
+                ]
+            ),
+            [
+                compile.objc_selector(
+                    None, compile.BStr("foo:"), b"v@:@", isRequired=False
+                )
+            ],
+        )
+
+    def test_default_retval(self):
+        self.assertEqual(
+            compile.merge_definition_lists(
+                [{"arch": "x86_64", "methods": [method("bar")]}]
+            ),
+            [
+                compile.objc_selector(
+                    None, compile.BStr("bar"), b"v@:", isRequired=False
+                )
+            ],
+        )
+
+    def test_different_encoding(self):
+        self.assertEqual(
+            compile.merge_definition_lists(
+                [
+                    {"arch": "i386", "methods": [method("foo:", b"i", retval=b"v")]},
+                    {"arch": "x86_64", "methods": [method("foo:", b"q", retval=b"v")]},
+                ]
+            ),
+            [
+                compile.objc_selector(
+                    None,
+                    compile.BStr("foo:"),
+                    compile.sel32or64(b"v@:i", b"v@:q"),
+                    isRequired=False,
+                )
+            ],
+        )
+
+
+def scan_record(arch="x86_64", typestr_special=False, **kwds):
+    result = {
+        "selector": "foo:",
+        "class_method": False,
+        "arch": arch,
+        "visibility": "public",
+        "retval": {"typestr": b"v", "typestr_special": False},
+        "args": [{"typestr": b"@", "typestr_special": typestr_special}],
+    }
+    result.update(kwds)
+    return result
+
+
+class TestMergeMethodInfo(unittest.TestCase):
+    def merge(self, infolist, only_special=True):
+        return compile.merge_method_info(
+            "NSObject", "foo:", False, infolist, None, only_special
+        )
+
+    def test_plain_record(self):
+        self.assertIsNone(self.merge([scan_record()]))
+
+        # Same result without the single record fast path
+        self.assertIsNone(self.merge([scan_record(), scan_record("arm64")]))
+
+    def test_special_typestr(self):
+        info = self.merge([scan_record(typestr_special=True)])
+        self.assertIsInstance(info, compile.MethodRecord)
+        self.assertEqual(info.clsname, "NSObject")
+        self.assertEqual(info.selector, "foo:")
+        self.assertIs(info.class_method, False)
+        self.assertEqual(list(info.metadata), ["arguments"])
+        self.assertEqual(list(info.metadata["arguments"]), [2])
+
+    def test_not_only_special(self):
+        info = self.merge([scan_record()], only_special=False)
+        self.assertIsInstance(info, compile.MethodRecord)
+        self.assertEqual(set(info.metadata), {"arguments", "retval"})
+
+    def test_extra_key(self):
+        info = self.merge([scan_record(variadic=True)])
+        self.assertIsInstance(info, compile.MethodRecord)
+        self.assertEqual(info.metadata, {"variadic": True})
+
+
+class TestClassifyArchs(unittest.TestCase):
+    def test_known_arch_sets(self):
+        known = (
+            compile._little_endian_archs
+            | compile._big_endian_archs
+            | compile._32_bit_archs
+            | compile._64_bit_archs
+        )
+        for archs1, archs2 in itertools.product(known, repeat=2):
+            with self.subTest(archs1=sorted(archs1), archs2=sorted(archs2)):
+                expected = compile._classify_arch_sets(archs1, archs2)
+                result = compile.classify_archs(set(archs1), set(archs2), "a", "b")
+                if expected is None:
+                    self.assertIsNone(result)
+                else:
+                    function, swapped = expected
+                    self.assertEqual(
+                        result, function("b", "a") if swapped else function("a", "b")
+                    )
+
+    def test_swapped(self):
+        self.assertEqual(
+            compile.classify_archs({"i386"}, {"x86_64"}, "a", "b"),
+            compile.sel32or64("a", "b"),
+        )
+        self.assertEqual(
+            compile.classify_archs({"x86_64"}, {"i386"}, "a", "b"),
+            compile.sel32or64("b", "a"),
+        )
+        self.assertEqual(
+            compile.classify_archs({"ppc"}, {"i386"}, "a", "b"),
+            compile.littleOrBig("b", "a"),
+        )
+        self.assertEqual(
+            compile.classify_archs({"ppc", "ppc64"}, {"x86_64"}, "a", "b"),
+            compile.littleOrBig("b", "a"),
+        )
+
+    def test_unknown_arch_set(self):
+        self.assertIsNone(compile.classify_archs({"arm64"}, {"x86_64"}, "a", "b"))
+        self.assertIsNone(compile.classify_archs({"x86_64"}, {"arm64"}, "a", "b"))
+        self.assertIsNone(
+            compile.classify_archs({"i386", "ppc64"}, {"x86_64"}, "a", "b")
+        )